@@ -12,11 +12,37 @@ Dependencies:
 - PIL: For image file handling.
 """
 
+import functools
+import io
+from typing import List
+
 import PyPDF2
 from pptx import Presentation
 from PIL import Image
 import google.generativeai as genai
 
+IMAGE_EXTENSIONS = ["jpg", "jpeg", "png"]
+
+# Marker the Vision model places between transcriptions in a batched OCR call.
+# Deliberately unusual so it cannot be confused with a markdown rule ("---").
+OCR_SEPARATOR = "=====IMAGE_BREAK====="
+
+@functools.lru_cache(maxsize=4)
+def _vision_model(api_key: str):
+    """Configures the SDK and builds the Vision model once per API key."""
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel("gemini-2.5-flash")
+
+def _safe_shape_text(shape) -> str:
+    """
+    Returns a shape's text, or "" for shapes without text (lines, pictures, ...).
+    Some shape types raise NotImplementedError on access ("unrecognized shape type").
+    """
+    try:
+        return getattr(shape, "text", "")
+    except NotImplementedError:
+        return ""
+
 def parse_file(uploaded_file, api_key: str = None) -> str:
     """
     Parses a file object (PDF, PPTX, or Image) and returns its textual content.
@@ -33,41 +59,77 @@ def parse_file(uploaded_file, api_key: str = None) -> str:
         # Note: We use the file extension as a heuristic for parsing strategy
         ext = uploaded_file.name.split('.')[-1].lower()
         text = ""
+        
+        # Read the upload into memory once; parsers then work on a seekable,
+        # in-memory buffer instead of issuing many small reads on the upload stream
+        data = uploaded_file.getvalue()
 
         # --- Strategy 1: PDF Parsing ---
         if ext == "pdf":
-            reader = PyPDF2.PdfReader(uploaded_file)
-            # Iterate through every page to concatenate text
-            for page in reader.pages: 
-                text += page.extract_text() or ""
+            reader = PyPDF2.PdfReader(io.BytesIO(data))
+            # One reader, one pass. extract_text is pure Python and holds the GIL,
+            # so splitting pages across threads (each needing its own reader) is slower.
+            text = "".join(page.extract_text() or "" for page in reader.pages)
                 
         # --- Strategy 2: PowerPoint Parsing ---
         elif ext == "pptx":
-            prs = Presentation(uploaded_file)
-            # Iterate through slides -> shapes -> text frames
-            for slide in prs.slides:
-                for shape in slide.shapes:
-                    # robustness check: not all shapes have text (e.g., lines, simple rects)
-                    if hasattr(shape, "text"): 
-                        text += shape.text + "\n"
+            prs = Presentation(io.BytesIO(data))
+            # Single pass over slides -> shapes, skipping empty and whitespace-only
+            # text (e.g. blank placeholders) so no blank lines reach the prompt
+            text = "\n".join(
+                t for slide in prs.slides for shape in slide.shapes
+                for t in (_safe_shape_text(shape),) if t and not t.isspace()
+            )
                         
         # --- Strategy 3: Image OCR (via Gemini Vision) ---
-        elif ext in ["jpg", "jpeg", "png"]:
+        elif ext in IMAGE_EXTENSIONS:
             if not api_key: return "Error: API Key needed for vision."
             
-            # Configure the Vision Model on the fly
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel("gemini-2.5-flash")
-            
             # Load image into PIL format
-            img = Image.open(uploaded_file)
+            img = Image.open(io.BytesIO(data))
             
             # Prompt the model to transcribe the image
-            res = model.generate_content(["Extract text from this image:", img])
+            res = _vision_model(api_key).generate_content(["Extract text from this image:", img])
             text = res.text
             
         return text.strip()
         
     except Exception as e:
         # Return error as string to be handled by the UI
-        return f"Error parsing file: {str(e)}"
\ No newline at end of file
+        return f"Error parsing file: {str(e)}"
+
+def parse_images(uploaded_files: list, api_key: str = None) -> List[str]:
+    """
+    Transcribes several images with a single Gemini Vision request.
+
+    Args:
+        uploaded_files: A list of image file objects (jpg, jpeg, png).
+        api_key (str): Google Gemini API Key.
+
+    Returns:
+        List[str]: One text (or error message starting with "Error") per input file, in order.
+    """
+    # A single image needs no batching
+    if len(uploaded_files) <= 1:
+        return [parse_file(f, api_key) for f in uploaded_files]
+    
+    if not api_key: return ["Error: API Key needed for vision."] * len(uploaded_files)
+    
+    try:
+        images = [Image.open(f) for f in uploaded_files]
+        prompt = (
+            f"Extract text from each of the following {len(images)} images, in order. "
+            f"Separate the transcriptions with a line containing only {OCR_SEPARATOR}:"
+        )
+        res = _vision_model(api_key).generate_content([prompt, *images])
+        texts = [t.strip() for t in res.text.split(OCR_SEPARATOR)]
+        
+        # If the model did not respect the separator, we cannot attribute text to files
+        if len(texts) == len(uploaded_files):
+            return texts
+        print("⚠️ Batched OCR returned an unexpected split. Falling back to one call per image.")
+    except Exception as e:
+        print(f"⚠️ Batched OCR failed: {e}. Falling back to one call per image.")
+    
+    for f in uploaded_files: f.seek(0)
+    return [parse_file(f, api_key) for f in uploaded_files]
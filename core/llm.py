@@ -12,10 +12,12 @@ Dependencies:
 """
 
 import google.generativeai as genai
+from google.api_core import exceptions as gexc
 import json
+import random
 import time
 from dataclasses import dataclass, field
-from typing import List, Optional, Dict
+from typing import Iterator, List, Optional, Dict
 
 # ==========================================
 # 1. DATA STRUCTURES
@@ -54,21 +56,31 @@ class GeminiHandler:
             # Standard configuration for free-form text generation.
             self.text_model = genai.GenerativeModel(model_name)
 
-    def _generate_with_retry(self, model, prompt, retries=3):
-        """Helper to retry API calls if we hit a rate limit (Quota Error)."""
-        for attempt in range(retries):
+    # Errors worth retrying: rate limits, overload and timeouts.
+    # Anything else (e.g. InvalidArgument, PermissionDenied) is raised immediately.
+    RETRYABLE_ERRORS = (
+        gexc.ResourceExhausted,
+        gexc.TooManyRequests,
+        gexc.ServiceUnavailable,
+        gexc.DeadlineExceeded,
+    )
+
+    def _generate_with_retry(self, model, prompt, max_retries=5, base=1.0, cap=30.0, jitter=0.5, **kwargs):
+        """
+        Helper to retry API calls on transient errors (rate limits, overload, timeouts).
+        Uses exponential backoff with jitter: min(cap, base * 2^attempt), stretched by up to `jitter`.
+        """
+        for attempt in range(max_retries):
             try:
-                return model.generate_content(prompt)
-            except Exception as e:
-                # Check if it's a 429 Quota Error
-                if "429" in str(e) or "Quota" in str(e):
-                    if attempt < retries - 1:
-                        wait_time = (attempt + 1) * 5  # Wait 5s, then 10s...
-                        print(f"⚠️ Quota hit. Waiting {wait_time}s to retry...")
-                        time.sleep(wait_time)
-                        continue
-                # If it's not a quota error, or we ran out of retries, raise it
-                raise e
+                return model.generate_content(prompt, **kwargs)
+            except self.RETRYABLE_ERRORS as e:
+                # Out of retries: surface the last transient error
+                if attempt == max_retries - 1:
+                    raise
+                delay = min(cap, base * 2 ** attempt) * (1 + random.random() * jitter)
+                print(f"⚠️ Transient error ({type(e).__name__}), attempt {attempt + 1}/{max_retries}. "
+                      f"Retrying in {delay:.1f}s...")
+                time.sleep(delay)
         return None
 
     def analyze_query(self, query: str, context: str) -> Optional[Dict]:
@@ -120,4 +132,20 @@ class GeminiHandler:
             res = self._generate_with_retry(self.text_model, prompt)
             return res.text
         except Exception as e:
-            return f"Generation failed: {str(e)}"
\ No newline at end of file
+            return f"Generation failed: {str(e)}"
+
+    def generate_text_stream(self, prompt: str) -> Iterator[str]:
+        """
+        Streaming variant of generate_text: yields text chunks as the model produces them.
+        Only the initial request is retried; errors after streaming has started are
+        surfaced as a final chunk, since the partial answer is already on screen.
+        """
+        if not self.api_key:
+            yield "API Key missing."
+            return
+        try:
+            res = self._generate_with_retry(self.text_model, prompt, stream=True)
+            for chunk in res:
+                yield chunk.text
+        except Exception as e:
+            yield f"Generation failed: {str(e)}"
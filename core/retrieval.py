@@ -11,6 +11,7 @@ from youtube_search import YoutubeSearch
 from duckduckgo_search import DDGS
 from typing import List, Dict
 import re
+import threading
 
 # ==========================================
 # 1. DOMAIN ALLOWLISTS
@@ -34,21 +35,38 @@ TRUSTED_SITES = {
     # (You can keep the other categories if you want, or stick to these core ones)
 }
 
+# Pre-built "site:" filters (top 4 domains per category), computed once at import
+TRUSTED_SITE_STRING = {
+    k: " OR ".join(f"site:{d}" for d in v[:4]) for k, v in TRUSTED_SITES.items()
+}
+
+# One DDGS client (and its underlying HTTP session) per thread, reused across
+# searches instead of opening a new connection per call. Per-thread clients let
+# concurrent searches run in parallel; reuse relies on long-lived callers such as
+# the service layer's retrieval pool. Clients live as long as their thread.
+_ddgs_local = threading.local()
+
+def _get_ddgs() -> DDGS:
+    """Returns this thread's DDGS client, creating it on first use (not at import)."""
+    client = getattr(_ddgs_local, "client", None)
+    if client is None:
+        client = _ddgs_local.client = DDGS()
+    return client
+
 # ==========================================
 # 2. HELPER: STRICT LANGUAGE FILTER
 # ==========================================
+# Anything outside ASCII, Latin-1/Latin Extended (accents, e.g. "café") and common
+# typographic punctuation (curly quotes, dashes, ellipsis). Compiled once at import.
+_NON_ENGLISH_RE = re.compile(r'[^\x00-\x7f\u00a0-\u024f\u2010-\u2027]')
+
 def is_english(text):
     """
-    Returns True ONLY if the text is composed of standard English characters.
+    Returns True ONLY if the text is composed of standard English (Latin) characters.
     This aggressively filters out Chinese, Russian, Arabic, etc.
     """
-    try:
-        # If the text can be encoded to ASCII, it's safe (English/Numbers/Symbols).
-        # If it crashes, it contains foreign characters.
-        text.encode('ascii')
-        return True
-    except UnicodeEncodeError:
-        return False
+    # Fast path: plain ASCII is checked in C without touching the regex engine.
+    return text.isascii() or _NON_ENGLISH_RE.search(text) is None
 
 # ==========================================
 # 3. SEARCH FUNCTIONS
@@ -69,31 +87,33 @@ def search_youtube(query: str, max_results: int = 2) -> List[Dict]:
         pass 
     return videos
 
+def _collect_links(results) -> List[Dict]:
+    """Single pass over ddgs.text() results, skipping duplicate URLs and non-English titles."""
+    links = []
+    seen = set()
+    for r in results:
+        if r['href'] in seen or not is_english(r['title']):
+            continue
+        seen.add(r['href'])
+        links.append({"title": r['title'], "link": r['href']})
+    return links
+
 def search_web(query: str, category: str) -> List[Dict]:
     """
     Performs a web search with STRICT English enforcement.
     """
-    trusted_domains = TRUSTED_SITES.get(category.lower(), TRUSTED_SITES["general"])
-    
     # Strategy A: Strict Academic Search
-    site_string = " OR ".join([f"site:{d}" for d in trusted_domains[:4]])
+    site_string = TRUSTED_SITE_STRING.get(category.lower(), TRUSTED_SITE_STRING["general"])
     smart_query = f"{query} ({site_string})"
     
     links = []
     
     try:
         # Attempt 1: Trusted Sites (forced region: us-en)
-        with DDGS() as ddgs:
-            results = list(ddgs.text(smart_query, region='us-en', max_results=4))
-            
-            if results:
-                for r in results:
-                    # Double Check: Only add if title is English
-                    if is_english(r['title']):
-                        links.append({"title": r['title'], "link": r['href']})
-                
-                # If we found valid links, return them
-                if links: return links
+        links = _collect_links(_get_ddgs().text(smart_query, region='us-en', max_results=4))
+        
+        # If we found valid links, return them
+        if links: return links
             
     except Exception as e:
         print(f"⚠️ Trusted search failed: {e}")
@@ -102,14 +122,10 @@ def search_web(query: str, category: str) -> List[Dict]:
     if not links:
         print("⚠️ Falling back to general web search (English Only)...")
         try:
-            with DDGS() as ddgs:
-                # region='us-en' is the key here!
-                for r in ddgs.text(query, region='us-en', max_results=5):
-                    # Final Filter: discard anything suspicious
-                    if is_english(r['title']):
-                        links.append({"title": r['title'], "link": r['href']})
+            # region='us-en' is the key here!
+            links = _collect_links(_get_ddgs().text(query, region='us-en', max_results=5))
                         
         except Exception as e:
             print(f"🚨 General search failed: {e}")
             
-    return links
\ No newline at end of file
+    return links
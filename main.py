@@ -34,14 +34,29 @@ st.set_page_config(
 if "messages" not in st.session_state: 
     st.session_state.messages = []
 
-if "context_cache" not in st.session_state: 
-    st.session_state.context_cache = ""
+# Uploaded documents are stored as a list of chunks; the joined string is
+# built lazily (see get_context) instead of re-concatenated on every upload.
+if "context_chunks" not in st.session_state: 
+    st.session_state.context_chunks = []
 
 if "file_list" not in st.session_state: 
     st.session_state.file_list = []
 
 frontend.render_css()
 
+def get_context() -> str:
+    """
+    Returns the concatenated knowledge base, re-joining only when chunks were added.
+    The context's cache key (context_cache_hash) is refreshed at the same time, so
+    reruns never rehash an unchanged knowledge base.
+    """
+    chunks = st.session_state.context_chunks
+    if st.session_state.get("context_chunk_count") != len(chunks):
+        st.session_state.context_cache = "".join(chunks)
+        st.session_state.context_cache_hash = service.hash_context(st.session_state.context_cache)
+        st.session_state.context_chunk_count = len(chunks)
+    return st.session_state.context_cache
+
 # ==========================================
 # 2. MAIN APPLICATION LOOP
 # ==========================================
@@ -63,15 +78,36 @@ def main():
         
         # 2. File Upload
         st.markdown('<div class="sidebar-card"><span>📂 KNOWLEDGE BASE</span></div>', unsafe_allow_html=True)
-        uploaded_file = st.file_uploader("Upload Context", type=["pdf", "pptx", "png", "jpg"], label_visibility="collapsed")
+        uploaded_files = st.file_uploader(
+            "Upload Context", type=["pdf", "pptx", "png", "jpg"], 
+            accept_multiple_files=True, label_visibility="collapsed"
+        )
         
-        # Process file only if it's new (prevents re-indexing on every interaction)
-        if uploaded_file and uploaded_file.name not in st.session_state.file_list:
+        # Process files only if they're new (prevents re-indexing on every interaction)
+        new_files = [f for f in uploaded_files or [] if f.name not in st.session_state.file_list]
+        if new_files:
             with st.spinner("Indexing..."):
-                text = service.process_file(uploaded_file, api_key)
-                if not text.startswith("Error"):
-                    st.session_state.context_cache += f"\n\n--- {uploaded_file.name} ---\n{text}"
-                    st.session_state.file_list.append(uploaded_file.name)
+                # Results are keyed by position in new_files: two uploads may share a name
+                texts = {}
+                
+                # Images are OCR'd together in a single Vision call
+                image_idx = [i for i, f in enumerate(new_files) if service.is_image(f.name)]
+                if image_idx:
+                    ocr = service.process_images(
+                        [(new_files[i].getvalue(), new_files[i].name) for i in image_idx], api_key
+                    )
+                    texts.update(zip(image_idx, ocr))
+                
+                for i, f in enumerate(new_files):
+                    if i not in texts:
+                        texts[i] = service.process_file(f.getvalue(), f.name, api_key)
+                
+                # Index in upload order
+                for i, f in enumerate(new_files):
+                    text = texts[i]
+                    if not text.startswith("Error"):
+                        st.session_state.context_chunks.append(f"\n\n--- {f.name} ---\n{text}")
+                        st.session_state.file_list.append(f.name)
         
         # 3. Reset Controls
         st.markdown("---")
@@ -143,15 +179,22 @@ def main():
     if st.session_state.messages and st.session_state.messages[-1]["role"] == "user":
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
-                # Call the Service Layer (cached internally)
-                result = service.handle_request(
-                    st.session_state.messages[-1]["content"], 
-                    st.session_state.context_cache, 
-                    api_key
-                )
+                query = st.session_state.messages[-1]["content"]
+                context = get_context()
                 
-                # Render Response
-                st.markdown(result.explanation)
+                # Prose-only routes stream tokens straight to the UI
+                stream = service.stream_request(query, context, api_key)
+                if stream is not None:
+                    full = st.write_stream(stream)
+                    result = service.finish_stream(query, full)
+                else:
+                    # Call the Service Layer (cached internally)
+                    result = service.handle_request(
+                        query, context, api_key, st.session_state.context_cache_hash
+                    )
+                    
+                    # Render Response
+                    st.markdown(result.explanation)
                 
                 # Save to History (including the 'data' object for persistence)
                 st.session_state.messages.append({
@@ -3,7 +3,12 @@ Service Layer: Integration & Caching.
 """
 
 import streamlit as st
+import hashlib
+import io
+import re
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
 from core import files, retrieval, llm
 
 # ==========================================
@@ -13,6 +18,30 @@ from core import files, retrieval, llm
 CMD_SUMMARIZE = "Summarize the uploaded documents."
 CMD_QUIZ = "Generate a quiz based on the context."
 
+# Context budgets (characters) per route. The largest one is applied once per
+# request, so the per-route slices below only ever copy from a bounded string.
+MAX_CONTEXT_CHARS = 50000      # Research analysis (JSON model)
+SUMMARY_CONTEXT_CHARS = 20000
+FALLBACK_CONTEXT_CHARS = 10000
+QUIZ_CONTEXT_CHARS = 5000
+
+# On an analysis cache miss, request the plain-text fallback answer alongside the
+# JSON analysis, so a failed analysis doesn't add a second sequential LLM round-trip.
+# Cached analyses and locally answered small talk never trigger the extra call.
+SPECULATIVE_FALLBACK = True
+
+# Trivial small talk answered locally, without an LLM round-trip
+_CHAT_PATTERNS = re.compile(
+    r'^(hi|hello|hey|thanks|thank you|ok|okay|cool|bye)[!. ]*$', re.I
+)
+_CHAT_REPLIES = {
+    "hi": "Hello! Ask me anything you'd like to learn about, or upload your notes to get started.",
+    "thanks": "You're welcome! Happy to help you learn.",
+    "ok": "Great! Let me know what you'd like to explore next.",
+    "bye": "Goodbye, and happy studying!",
+}
+_CHAT_ALIASES = {"hello": "hi", "hey": "hi", "thank you": "thanks", "okay": "ok", "cool": "ok"}
+
 # ==========================================
 # 2. CACHING WRAPPERS
 # ==========================================
@@ -25,41 +54,114 @@ def cached_video_search(query: str):
 def cached_web_search(query: str, category: str):
     return retrieval.search_web(query, category)
 
+def _to_buffer(content_bytes: bytes, name: str) -> io.BytesIO:
+    buffer = io.BytesIO(content_bytes)
+    buffer.name = name  # parse_file picks its strategy from the extension
+    return buffer
+
+class _ParseFailed(Exception):
+    """Raised inside the parse caches so error results (e.g. a transient OCR 429) are not cached."""
+    def __init__(self, result):
+        super().__init__(result)
+        self.result = result
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def process_file_cached(digest: str, name: str, api_key: str, _content_bytes: bytes):
+    # Keyed on the content digest; the raw bytes (underscore arg) are not hashed by Streamlit.
+    text = files.parse_file(_to_buffer(_content_bytes, name), api_key)
+    if text.startswith("Error"):
+        raise _ParseFailed(text)
+    return text
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def process_images_cached(digests: tuple, names: tuple, api_key: str, _contents: tuple):
+    buffers = [_to_buffer(c, n) for c, n in zip(_contents, names)]
+    texts = files.parse_images(buffers, api_key)
+    # Only cache batches where every image was transcribed
+    if any(t.startswith("Error") for t in texts):
+        raise _ParseFailed(texts)
+    return texts
+
+# Long-lived pool for request I/O (searches, fallback text). Its worker threads
+# outlive a single request, so each keeps its per-thread DDGS client (see
+# core.retrieval) and reuses that connection across searches.
+_RETRIEVAL_POOL = ThreadPoolExecutor(max_workers=8)
+
+def fetch_resources(video_query: str, web_query: str, category: str):
+    """Runs the (independent) YouTube and web searches concurrently. Returns (videos, articles)."""
+    f_v = _RETRIEVAL_POOL.submit(cached_video_search, video_query)
+    f_a = _RETRIEVAL_POOL.submit(cached_web_search, web_query, category)
+    return f_v.result(), f_a.result()
+
 @st.cache_resource
 def get_llm_handler(api_key: str):
     return llm.GeminiHandler(api_key)
 
+class _AnalysisFailed(Exception):
+    """Raised inside cached_analyze so failed analyses are not cached."""
+    def __init__(self, fallback=None):
+        super().__init__()
+        self.fallback = fallback  # Future of the speculative fallback text, if one was started
+
+@st.cache_data(ttl=1800, show_spinner=False)
+def cached_analyze(query: str, context_hash: str, api_key: str, _context: str, _fallback_prompt: str = None):
+    # Keyed on the context hash; the context itself (underscore arg) is not hashed by Streamlit.
+    # This body only runs on a cache miss, so that is the only time the fallback is speculated.
+    handler = get_llm_handler(api_key)
+    f_fallback = None
+    if SPECULATIVE_FALLBACK and _fallback_prompt:
+        f_fallback = _RETRIEVAL_POOL.submit(handler.generate_text, _fallback_prompt)
+    data = handler.analyze_query(query, _context)
+    if not data:
+        raise _AnalysisFailed(f_fallback)
+    return data
+
+# Cache key used when no documents have been uploaded
+EMPTY_CONTEXT_HASH = "no-context"
+
+def hash_context(context: str) -> str:
+    """Stable cache key for a knowledge base. Callers should memoize it per upload."""
+    if not context:
+        return EMPTY_CONTEXT_HASH
+    return hashlib.blake2b(context.encode(), digest_size=16).hexdigest()
+
+def analyze(query: str, context: str, api_key: str, context_hash: Optional[str] = None,
+            fallback_prompt: Optional[str] = None):
+    """
+    Cached analyze_query. Returns (data, fallback): the parsed JSON dict (None on failure)
+    and, when the analysis failed, a Future of the speculative fallback text (or None).
+    """
+    if context_hash is None:
+        context_hash = hash_context(context)
+    try:
+        return cached_analyze(query, context_hash, api_key, context, fallback_prompt), None
+    except _AnalysisFailed as e:
+        return None, e.fallback
+
 # ==========================================
 # 3. BUSINESS LOGIC
 # ==========================================
 
-def handle_request(query: str, context: str, api_key: str) -> llm.ResourceResult:
-    """
-    The central brain. 
-    Includes a Universal Fallback to handle complex generation requests.
-    """
-    handler = get_llm_handler(api_key)
-    
-    # --- HELPER: Fail-Safe Link Generator ---
-    def ensure_links(topic, current_links):
-        """If no links found, generate direct search links so the UI is never empty."""
-        if not current_links:
-            safe_topic = urllib.parse.quote(topic)
-            return [
-                {
-                    "title": f"📖 Learn '{topic}' on Khan Academy", 
-                    "link": f"https://www.khanacademy.org/search?page_search_query={safe_topic}"
-                },
-                {
-                    "title": f"🎓 Academic Papers: {topic}", 
-                    "link": f"https://scholar.google.com/scholar?q={safe_topic}"
-                }
-            ]
-        return current_links
+# --- HELPER: Fail-Safe Link Generator ---
+def ensure_links(topic, current_links):
+    """If no links found, generate direct search links so the UI is never empty."""
+    if not current_links:
+        safe_topic = urllib.parse.quote(topic)
+        return [
+            {
+                "title": f"📖 Learn '{topic}' on Khan Academy", 
+                "link": f"https://www.khanacademy.org/search?page_search_query={safe_topic}"
+            },
+            {
+                "title": f"🎓 Academic Papers: {topic}", 
+                "link": f"https://scholar.google.com/scholar?q={safe_topic}"
+            }
+        ]
+    return current_links
 
-    # --- ROUTE 1: SUMMARIES (Syllabus Mode) ---
-    if query == CMD_SUMMARIZE:
-        prompt = f"""
+# --- HELPERS: Prompt Builders for the Text-Only Routes ---
+def _summary_prompt(context: str) -> str:
+    return f"""
         Analyze the document and extract the Technical Syllabus.
         Ignore admin details. Focus on core modules.
         
@@ -71,50 +173,76 @@ def handle_request(query: str, context: str, api_key: str) -> llm.ResourceResult
         SEARCH_QUERY: <Insert the hardest technical topic here>
         
         Document Context:
-        {context[:20000]}
+        {context[:SUMMARY_CONTEXT_CHARS]}
         """
+
+def _quiz_prompt(context: str) -> str:
+    return f"Create a 3-question quiz based on:\n{context[:QUIZ_CONTEXT_CHARS]}"
+
+def _build_summary_result(full_response: str) -> llm.ResourceResult:
+    """Splits the SEARCH_QUERY tag off a syllabus summary and attaches resources for it."""
+    clean_response = full_response.replace("**SEARCH_QUERY:**", "SEARCH_QUERY:")
+    
+    # Default fallback
+    search_topic = "Computer Science Core"
+    summary_text = full_response
+
+    if "SEARCH_QUERY:" in clean_response:
+        parts = clean_response.split("SEARCH_QUERY:")
+        summary_text = parts[0].strip()
+        search_topic = parts[1].strip()
+
+    # FORCE BOTH:
+    videos, raw_articles = fetch_resources(search_topic, search_topic, "cs")
+    articles = ensure_links(search_topic, raw_articles)
         
-        full_response = handler.generate_text(prompt)
-        clean_response = full_response.replace("**SEARCH_QUERY:**", "SEARCH_QUERY:")
-        
-        # Default fallback
-        search_topic = "Computer Science Core"
-        summary_text = full_response
-
-        if "SEARCH_QUERY:" in clean_response:
-            parts = clean_response.split("SEARCH_QUERY:")
-            summary_text = parts[0].strip()
-            search_topic = parts[1].strip()
-
-        # FORCE BOTH:
-        videos = cached_video_search(search_topic)
-        raw_articles = cached_web_search(search_topic, "cs")
-        articles = ensure_links(search_topic, raw_articles)
-            
-        return llm.ResourceResult(
-            explanation=summary_text, 
-            category="Syllabus",
-            videos=videos,
-            articles=articles
-        )
+    return llm.ResourceResult(
+        explanation=summary_text, 
+        category="Syllabus",
+        videos=videos,
+        articles=articles
+    )
+
+def handle_request(query: str, context: str, api_key: str, context_hash: Optional[str] = None) -> llm.ResourceResult:
+    """
+    The central brain. 
+    Includes a Universal Fallback to handle complex generation requests.
+    `context_hash` (see hash_context) lets the caller reuse a memoized key instead of rehashing.
+    """
+    handler = get_llm_handler(api_key)
+    context = context[:MAX_CONTEXT_CHARS]
+
+    # --- ROUTE 1: SUMMARIES (Syllabus Mode) ---
+    if query == CMD_SUMMARIZE:
+        return _build_summary_result(handler.generate_text(_summary_prompt(context)))
         
     # --- ROUTE 2: QUIZ ---
     elif query == CMD_QUIZ:
-        text = handler.generate_text(f"Create a 3-question quiz based on:\n{context[:5000]}")
+        text = handler.generate_text(_quiz_prompt(context))
         return llm.ResourceResult(explanation=text, category="Quiz")
 
-    # --- ROUTE 3: INTELLIGENT RESEARCH ---
-    data = handler.analyze_query(query, context)
+    # --- ROUTE 3: SMALL TALK FAST PATH ---
+    match = _CHAT_PATTERNS.match(query.strip())
+    if match:
+        word = match.group(1).lower()
+        return llm.ResourceResult(
+            explanation=_CHAT_REPLIES[_CHAT_ALIASES.get(word, word)],
+            category="chat"
+        )
+
+    # --- ROUTE 4: INTELLIGENT RESEARCH ---
+    fallback_prompt = f"Context: {context[:FALLBACK_CONTEXT_CHARS]}\n\nUser Request: {query}"
+    data, f_fallback = analyze(query, context, api_key, context_hash, fallback_prompt)
     
-    # --- ROUTE 4: UNIVERSAL FALLBACK (The Fix for "Failed to Analyze") ---
+    # --- ROUTE 5: UNIVERSAL FALLBACK (The Fix for "Failed to Analyze") ---
     # If the JSON model fails (returns None), we switch to the Text model.
     if not data:
         print("⚠️ JSON Analysis failed. Switching to Direct Text Generation.")
-        fallback_text = handler.generate_text(f"Context: {context[:10000]}\n\nUser Request: {query}")
-        
-        # We still want resources, so we use the raw user query
-        videos = cached_video_search(query)
-        raw_articles = cached_web_search(query, "general")
+        # We still want resources, so we search on the raw user query while the text model writes
+        f_text = f_fallback or _RETRIEVAL_POOL.submit(handler.generate_text, fallback_prompt)
+        f_v = _RETRIEVAL_POOL.submit(cached_video_search, query)
+        f_a = _RETRIEVAL_POOL.submit(cached_web_search, query, "general")
+        fallback_text, videos, raw_articles = f_text.result(), f_v.result(), f_a.result()
         articles = ensure_links(query, raw_articles)
         
         return llm.ResourceResult(
@@ -124,7 +252,7 @@ def handle_request(query: str, context: str, api_key: str) -> llm.ResourceResult
             articles=articles
         )
 
-    # --- ROUTE 5: STANDARD SUCCESS FLOW ---
+    # --- ROUTE 6: STANDARD SUCCESS FLOW ---
     # Chat Bypass
     if data.get("category") == "chat":
         return llm.ResourceResult(
@@ -135,13 +263,12 @@ def handle_request(query: str, context: str, api_key: str) -> llm.ResourceResult
     # Force Video Search
     yt_query = data.get("youtube_query")
     if not yt_query: yt_query = query 
-    videos = cached_video_search(yt_query)
     
     # Force Web Search (+ Fail-Safe)
     web_query = data.get("web_query")
     if not web_query: web_query = query
     
-    raw_articles = cached_web_search(web_query, data.get("category", "general"))
+    videos, raw_articles = fetch_resources(yt_query, web_query, data.get("category", "general"))
     articles = ensure_links(web_query, raw_articles)
 
     return llm.ResourceResult(
@@ -152,5 +279,43 @@ def handle_request(query: str, context: str, api_key: str) -> llm.ResourceResult
         articles=articles
     )
 
-def process_file(file, api_key):
-    return files.parse_file(file, api_key)
\ No newline at end of file
+def stream_request(query: str, context: str, api_key: str) -> Optional[Iterator[str]]:
+    """
+    Token stream for the routes whose answer is free-form prose (Summary, Quiz),
+    so the UI can render text as it arrives. Returns None for every other route;
+    those go through handle_request. Pair with finish_stream once the stream ends.
+    """
+    handler = get_llm_handler(api_key)
+    context = context[:MAX_CONTEXT_CHARS]
+    if query == CMD_SUMMARIZE:
+        return handler.generate_text_stream(_summary_prompt(context))
+    if query == CMD_QUIZ:
+        return handler.generate_text_stream(_quiz_prompt(context))
+    return None
+
+def finish_stream(query: str, full_text: str) -> llm.ResourceResult:
+    """Builds the final result (including resources) from a completed stream_request."""
+    if query == CMD_SUMMARIZE:
+        return _build_summary_result(full_text)
+    return llm.ResourceResult(explanation=full_text, category="Quiz")
+
+def _digest(content_bytes: bytes) -> str:
+    return hashlib.blake2b(content_bytes, digest_size=16).hexdigest()
+
+def is_image(name: str) -> bool:
+    return name.split('.')[-1].lower() in files.IMAGE_EXTENSIONS
+
+def process_file(content_bytes: bytes, name: str, api_key: str) -> str:
+    try:
+        return process_file_cached(_digest(content_bytes), name, api_key, content_bytes)
+    except _ParseFailed as e:
+        return e.result
+
+def process_images(items: list, api_key: str) -> list:
+    """OCRs several (content_bytes, name) images in one Vision call. Returns texts in order."""
+    contents = tuple(c for c, _ in items)
+    names = tuple(n for _, n in items)
+    try:
+        return process_images_cached(tuple(_digest(c) for c in contents), names, api_key, contents)
+    except _ParseFailed as e:
+        return e.result
\ No newline at end of file